@@ -1,9 +1,9 @@
 import os
-import json
+import orjson
 import shutil
 import time
-import requests
-import urllib3
+import asyncio
+import aiohttp
 import pandas as pd
 from tqdm import tqdm
 from huggingface_hub import HfApi
@@ -20,14 +20,18 @@ DIRS = {
     "clean": os.path.join(BASE_DIR, "clean")
 }
 
-# Disable SSL Warnings (British Museum media server has certificate issues)
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
 # Browser Headers
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 }
 
+# Download Concurrency
+MAX_CONNECTIONS = 64
+MAX_CONCURRENT_DOWNLOADS = 32
+DOWNLOAD_TIMEOUT = 20
+CHUNK_SIZE = 256 * 1024
+WRITE_BUFFER_SIZE = 1 << 20
+
 def setup_directories():
     """Reset output directories."""
     if os.path.exists(BASE_DIR):
@@ -35,6 +39,95 @@ def setup_directories():
     for d in DIRS.values():
         os.makedirs(d, exist_ok=True)
 
+def _text_column(df, name, default):
+    """Returns a CSV column as strings, or the default for every row if the column is missing."""
+    if name in df.columns:
+        # Same as str(value) per cell: empty cells become "nan"
+        return df[name].fillna("nan").astype(str)
+    return pd.Series(default, index=df.index)
+
+def build_download_tasks(df):
+    """Builds (museum_number, img_url, filepath, metadata) tuples from the CSV."""
+    # 1. Keep rows with a valid Image URL
+    if "Image" not in df.columns:
+        return []
+    images = df["Image"].fillna("").astype(str)
+    has_image = images.str.startswith("http")
+    df, img_urls = df[has_image], images[has_image]
+    if df.empty:
+        return []
+
+    # 2. Create filenames: bm_Af1934_01.jpg
+    museum_numbers = _text_column(df, "Museum number", "unknown").str.strip()
+    safe_ids = (
+        museum_numbers
+        .str.replace(".", "_", regex=False)
+        .str.replace(" ", "_", regex=False)
+        .str.replace("/", "-", regex=False)
+        .str.replace(",", "", regex=False)
+    )
+    exts = img_urls.str.rsplit(".", n=1).str[-1]
+    filepaths = DIRS["images"] + os.sep + "bm_" + safe_ids + "." + exts
+
+    # 3. Extract Metadata
+    columns = zip(
+        museum_numbers, img_urls, filepaths,
+        _text_column(df, "Title", "Untitled"),
+        _text_column(df, "Description", ""),
+        _text_column(df, "Object type", ""),
+        _text_column(df, "Production date", ""),
+        _text_column(df, "Materials", ""),
+    )
+    tasks = []
+    for museum_number, img_url, filepath, title, description, object_type, production_date, materials in columns:
+        metadata = {
+            "title": title,
+            "idno": museum_number,
+            "description": description,
+            "object_type": object_type,
+            "production_date": production_date,
+            "materials": materials,
+            "copyright": "© The Trustees of the British Museum"
+        }
+        tasks.append((museum_number, img_url, filepath, metadata))
+    return tasks
+
+async def _download_one(session, sem, task, pbar):
+    """Downloads a single image. Returns the task on success, None on failure."""
+    museum_number, img_url, filepath, _ = task
+    async with sem:
+        try:
+            if not os.path.exists(filepath):
+                # Stream to a .part file so a failed download never looks complete
+                part_path = filepath + ".part"
+                async with session.get(img_url) as r:
+                    if r.status != 200:
+                        return None # Skip if download failed
+                    # Writes land in the 1 MB buffer, so they are cheap enough to run on the event loop
+                    with open(part_path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+                        async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+                            f.write(chunk)
+                os.replace(part_path, filepath)
+            return task
+        except Exception as e:
+            print(f"   Error on {museum_number}: {e}")
+            if os.path.exists(filepath + ".part"):
+                os.remove(filepath + ".part")
+            return None
+        finally:
+            pbar.update(1)
+
+async def _download_all(tasks):
+    """Downloads all images concurrently over a single session."""
+    sem = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+    # ssl=False: British Museum media server has certificate issues
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, ssl=False)
+    timeout = aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT)
+    
+    async with aiohttp.ClientSession(connector=connector, headers=HEADERS, timeout=timeout) as session:
+        with tqdm(total=len(tasks), desc="Downloading") as pbar:
+            return await asyncio.gather(*[_download_one(session, sem, t, pbar) for t in tasks])
+
 def process_british_museum():
     """Reads CSV and downloads images."""
     
@@ -47,67 +140,44 @@ def process_british_museum():
     print(f"📖 Reading {CSV_FILENAME}...")
     df = pd.read_csv(CSV_FILENAME)
     
-    # Convert to list of dicts
-    records = df.to_dict(orient='records')
-    processed_data = []
+    tasks = build_download_tasks(df)
+    
+    # Rows can share a file path (duplicate rows, or museum numbers that sanitise alike);
+    # download each path once (first row wins) so no two tasks write the same file
+    unique_tasks = {}
+    for task in tasks:
+        unique_tasks.setdefault(task[2], task)
     
-    print(f"🔍 Found {len(records)} rows. Starting download...")
+    print(f"🔍 Found {len(df)} rows ({len(tasks)} with images). Starting download...")
+    results = asyncio.run(_download_all(list(unique_tasks.values())))
+    downloaded = {result[2] for result in results if result is not None}
     
-    for row in tqdm(records, desc="Processing"):
-        # 1. Get Image URL
-        img_url = row.get("Image")
-        
-        # Skip if invalid
-        if not isinstance(img_url, str) or not img_url.startswith("http"):
+    # 4. Add successful downloads to dataset
+    processed_data = []
+    for museum_number, img_url, filepath, metadata in tasks:
+        if filepath not in downloaded:
             continue
-
-        # 2. Extract Metadata
-        museum_number = str(row.get("Museum number", "unknown")).strip()
-        
-        metadata = {
-            "title": str(row.get("Title", "Untitled")),
-            "idno": museum_number,
-            "description": str(row.get("Description", "")),
-            "object_type": str(row.get("Object type", "")),
-            "production_date": str(row.get("Production date", "")),
-            "materials": str(row.get("Materials", "")),
-            "copyright": "© The Trustees of the British Museum"
-        }
-
-        # 3. Download Image
-        try:
-            # Create filename: bm_Af1934_01.jpg
-            safe_id = museum_number.replace(".", "_").replace(" ", "_").replace("/", "-").replace(",", "")
-            ext = img_url.split('.')[-1]
-            filename = f"bm_{safe_id}.{ext}"
-            filepath = os.path.join(DIRS["images"], filename)
-            
-            # Download (Ignoring SSL errors)
-            if not os.path.exists(filepath):
-                r = requests.get(img_url, headers=HEADERS, stream=True, timeout=15, verify=False)
-                if r.status_code == 200:
-                    with open(filepath, 'wb') as f:
-                        for chunk in r.iter_content(1024):
-                            f.write(chunk)
-                else:
-                    continue # Skip if download failed
-            
-            # 4. Add to dataset
-            processed_data.append({
-                "id": museum_number,
-                "source_id": SOURCE_ID,
-                "source_url": "https://www.britishmuseum.org/collection", 
-                "metadata": metadata,
-                "images": [
-                    {"file_name": filename, "original_url": img_url}
-                ]
-            })
-            
-        except Exception as e:
-            print(f"   Error on {museum_number}: {e}")
+        processed_data.append({
+            "id": museum_number,
+            "source_id": SOURCE_ID,
+            "source_url": "https://www.britishmuseum.org/collection", 
+            "metadata": metadata,
+            "images": [
+                {"file_name": os.path.basename(filepath), "original_url": img_url}
+            ]
+        })
 
     return processed_data
 
+def link_or_copy(src, dst):
+    """Hardlinks src to dst, falling back to a copy across filesystems."""
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copy2(src, dst)
+
 def save_and_package(data):
     """Saves JSONL and packages files for upload."""
     if not data:
@@ -117,9 +187,9 @@ def save_and_package(data):
     # 1. Save JSONL
     jsonl_path = os.path.join(DIRS["clean"], "data.jsonl")
     print(f"💾 Saving metadata to {jsonl_path}...")
-    with open(jsonl_path, "w", encoding="utf-8") as f:
+    with open(jsonl_path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
         for item in data:
-            f.write(json.dumps(item) + "\n")
+            f.write(orjson.dumps(item, option=orjson.OPT_APPEND_NEWLINE))
             
     # 2. Package Images (Move to clean/images/)
     final_images_dir = os.path.join(DIRS["clean"], "images")
@@ -131,7 +201,7 @@ def save_and_package(data):
             src = os.path.join(DIRS["images"], img["file_name"])
             dst = os.path.join(final_images_dir, img["file_name"])
             if os.path.exists(src):
-                shutil.copy2(src, dst)
+                link_or_copy(src, dst)
 
 def upload_to_hf():
     """Uploads to Hugging Face."""
@@ -145,13 +215,22 @@ def upload_to_hf():
     api.create_repo(repo_id=REPO_ID, repo_type="dataset", exist_ok=True)
     
     try:
-        api.upload_folder(
-            folder_path=DIRS["clean"],
-            repo_id=REPO_ID,
-            repo_type="dataset",
-            path_in_repo=".",
-            commit_message="Upload British Museum Collection"
-        )
+        # Uploads in parallel, splits into multiple commits and resumes after failures
+        if hasattr(api, "upload_large_folder"):
+            api.upload_large_folder(
+                folder_path=DIRS["clean"],
+                repo_id=REPO_ID,
+                repo_type="dataset",
+                num_workers=8
+            )
+        else: # Not available in every huggingface_hub release
+            api.upload_folder(
+                folder_path=DIRS["clean"],
+                repo_id=REPO_ID,
+                repo_type="dataset",
+                path_in_repo=".",
+                commit_message="Upload British Museum Collection"
+            )
         print("🎉 Success! Dataset uploaded.")
     except Exception as e:
         print(f"❌ Upload failed: {e}")
@@ -1,13 +1,18 @@
 
 import os
-import json
+import orjson
 import requests
 import re
 import time
-import shutil
 import logging
-from bs4 import BeautifulSoup
-from tqdm.notebook import tqdm
+import hashlib
+import uuid
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
+from tqdm.auto import tqdm
 from urllib.parse import urljoin
 from datetime import datetime
 from PIL import Image, UnidentifiedImageError
@@ -17,19 +22,51 @@ from huggingface_hub import HfApi, create_repo
 BASE_URL = "https://jonesarchive.siu.edu/"
 SOURCE_NAME = "G.I. Jones Archive (SIU)"
 SOURCE_ID = "gijones" # for filenames
+LICENSE_INFO = "© G.I. Jones Estate (Handled by MAA Cambridge)"
 REPO_ID = "nwokikeonyeka/gi_jones_archive_dataset"
 LOG_FILE = "gijones_scraper.log"
 
-RAW_DIR = "data_jones_raw"
 CLEAN_DIR = "data_jones_clean"
-RAW_IMG_DIR = os.path.join(RAW_DIR, "images")
 CLEAN_IMG_DIR = os.path.join(CLEAN_DIR, "images")
-RAW_JSONL = os.path.join(RAW_DIR, "data.jsonl")
 CLEAN_JSONL = os.path.join(CLEAN_DIR, "data.jsonl")
 CLEAN_README = os.path.join(CLEAN_DIR, "README.md")
-os.makedirs(RAW_IMG_DIR, exist_ok=True)
 os.makedirs(CLEAN_IMG_DIR, exist_ok=True)
 
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Concurrent page fetches and image downloads (bounds the load on the archive host)
+MAX_CRAWL_WORKERS = 8
+MAX_DOWNLOAD_WORKERS = 8
+
+# Buffer sizes for streamed downloads and JSONL output
+CHUNK_SIZE = 256 * 1024
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Download futures by URL for this run (result None = failed); later callers wait on the first fetch
+_URL_RESULT_CACHE = {}
+_URL_CACHE_LOCK = threading.Lock()
+
+# Filename sanitising patterns
+_RE_STRIP = re.compile(r'[^\w\s.-]') # Allow dots
+_RE_DASH = re.compile(r'--+')
+
+# Leading bytes of the accepted image formats (WebP is checked separately)
+_IMAGE_MAGIC = (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n", b"GIF8")
+
+# Shared session: keeps connections to the archive host alive between requests
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504])
+))
+
+# Image downloads run here, overlapping with page parsing in the crawl workers
+DOWNLOAD_POOL = ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS)
+
 # --- 3. Setup Logging ---
 logging.basicConfig(
     level=logging.INFO,
@@ -46,29 +83,25 @@ def main():
     HF_TOKEN = input("Paste your Hugging Face WRITE token: ").strip()
 
     run_scraper()
-    run_cleaner()
     create_readme()
     upload_to_hf(HF_TOKEN)
 
 # --- 4. Scraper Functions (with Improvements) ---
 
-def get_soup(url):
+def get_soup(url, parse_only=None):
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        r = requests.get(url, timeout=20, headers=headers)
+        r = SESSION.get(url, timeout=20)
         r.raise_for_status()
-        r.encoding = r.apparent_encoding 
-        return BeautifulSoup(r.text, "html.parser")
+        # Pass raw bytes so lxml detects the encoding itself
+        return BeautifulSoup(r.content, "lxml", parse_only=parse_only)
     except requests.exceptions.RequestException as e:
         logging.error(f"Failed to get soup for {url}: {e}")
         return None
 
 def sanitize_filename(name):
     name = name.lower().replace(" ", "-")
-    name = re.sub(r'[^\w\s.-]', '', name) # Allow dots
-    name = re.sub(r'--+', '-', name)
+    name = _RE_STRIP.sub('', name)
+    name = _RE_DASH.sub('-', name)
     return name[:100]
 
 def get_all_category_pages(base_url):
@@ -76,7 +109,7 @@ def get_all_category_pages(base_url):
     category_pages = set()
     index_page_url = urljoin(base_url, "photo-indexes/")
     
-    soup = get_soup(index_page_url)
+    soup = get_soup(index_page_url, parse_only=SoupStrainer("a", href=True))
     if not soup:
         logging.critical("Failed to load photo-indexes/, cannot find categories.")
         return []
@@ -96,32 +129,87 @@ def get_all_category_pages(base_url):
              category_pages.add(full_link)
     
     logging.info(f"Found {len(category_pages)} categories.")
-    return list(category_pages)
+    return sorted(category_pages) # Sets have no stable order between runs
+
+def _is_image_header(head):
+    if head.startswith(b"RIFF"):
+        return head[8:12] == b"WEBP"
+    return head.startswith(_IMAGE_MAGIC)
+
+def _stream_image(img_url, part_path):
+    # Returns bytes written; rejects non-images by their leading bytes and short reads by Content-Length
+    file_size = 0
+    head = b""
+    with SESSION.get(img_url, stream=True, timeout=15) as r:
+        r.raise_for_status()
+        with open(part_path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                if len(head) < 12:
+                    # Chunks can be tiny, so collect the first 12 bytes before sniffing them
+                    head += chunk[:12 - len(head)]
+                    if len(head) == 12 and not _is_image_header(head):
+                        raise ValueError("response is not a JPEG/PNG/GIF/WebP image")
+                f.write(chunk)
+                file_size += len(chunk)
+        if not file_size:
+            raise ValueError("empty response")
+        if len(head) < 12:
+            raise ValueError("response is not a JPEG/PNG/GIF/WebP image")
+        expected_size = r.headers.get("Content-Length")
+        if expected_size and "Content-Encoding" not in r.headers and int(expected_size) != file_size:
+            raise ValueError(f"truncated download ({file_size} of {expected_size} bytes)")
+    return file_size
 
 def download_image(img_url):
+    with _URL_CACHE_LOCK:
+        future = _URL_RESULT_CACHE.get(img_url)
+        is_owner = future is None
+        if is_owner:
+            future = _URL_RESULT_CACHE[img_url] = Future()
+    if is_owner:
+        future.set_result(_fetch_image(img_url))
+    return future.result()
+
+def _fetch_image(img_url):
     try:
-        r = requests.get(img_url, timeout=15, headers={'User-Agent': 'Mozilla/5.0'})
-        r.raise_for_status()
-        data = r.content
-        
         original_filename = os.path.basename(img_url.split("?")[0])
         safe_filename = sanitize_filename(original_filename)
-        new_filename = f"{SOURCE_ID}_{safe_filename}"
+        # The URL hash keeps names unique when uploads from different months share a basename
+        url_hash = hashlib.sha1(img_url.encode("utf-8")).hexdigest()[:10]
+        name, ext = os.path.splitext(safe_filename)
+        new_filename = f"{SOURCE_ID}_{name}_{url_hash}{ext}"
+        save_path = os.path.join(CLEAN_IMG_DIR, new_filename)
         
-        save_path = os.path.join(RAW_IMG_DIR, new_filename)
-        with open(save_path, "wb") as f:
-            f.write(data)
-            
-        with Image.open(save_path) as img:
-            width, height = img.size
-        file_size = os.path.getsize(save_path)
+        # Reuse a validated download from a previous run
+        try:
+            cached_size = os.stat(save_path).st_size
+        except FileNotFoundError:
+            cached_size = None
+        if cached_size is not None:
+            with Image.open(save_path) as img:
+                width, height = img.size
+            return (new_filename, width, height, cached_size)
+        
+        # Stream to a .part file so an interrupted download is never mistaken for a complete one.
+        # The signature and length checks in _stream_image replace a full Image.verify() pass;
+        # only good images reach CLEAN_IMG_DIR.
+        # Unique per attempt, and created by open() so the final file gets the usual umask mode
+        part_path = f"{save_path}.{uuid.uuid4().hex}.part"
+        try:
+            file_size = _stream_image(img_url, part_path)
+            with Image.open(part_path) as img:
+                width, height = img.size
+        except Exception:
+            if os.path.exists(part_path): os.remove(part_path)
+            raise
+        os.replace(part_path, save_path)
             
         return (new_filename, width, height, file_size)
     except Exception as e:
         logging.warning(f"Failed to download image {img_url}: {e}")
         return None
 
-def scrape_gallery_page(url):
+def scrape_gallery_page(url, run_ts):
     soup = get_soup(url)
     if soup is None: return []
 
@@ -132,6 +220,8 @@ def scrape_gallery_page(url):
         logging.warning(f"No gallery items found on {url}")
         return []
     
+    # Queue every download first so they run while the rest of the page is parsed
+    pending = []
     for item in gallery_items:
         img_link_tag = item.select_one(".et_pb_gallery_image a[href]")
         caption_tag = item.select_one(".et_pb_gallery_caption")
@@ -141,9 +231,11 @@ def scrape_gallery_page(url):
 
         full_image_url = img_link_tag['href']
         caption = caption_tag.get_text(strip=True) if caption_tag else "Untitled"
+        pending.append((full_image_url, caption, DOWNLOAD_POOL.submit(download_image, full_image_url)))
+
+    for full_image_url, caption, future in pending:
         title = caption
-        
-        img_stats = download_image(full_image_url)
+        img_stats = future.result()
         
         if img_stats:
             new_filename, width, height, file_size = img_stats
@@ -166,63 +258,40 @@ def scrape_gallery_page(url):
                 "raw_content": caption,
                 "images": scraped_images,
                 "tags_scraped": [],
-                "license_info": "© G.I. Jones Estate (Handled by MAA Cambridge)",
-                "timestamp_scraped": datetime.now().isoformat(),
+                "license_info": LICENSE_INFO,
+                "timestamp_scraped": run_ts,
                 "source_specific_metadata": {"source_id": SOURCE_ID, "gallery_page": url}
             }
             all_post_data.append(post_data)
     return all_post_data
 
 def run_scraper():
-    logging.info(f"--- [PART 1/4] Starting scrape of {BASE_URL} ---")
+    logging.info(f"--- [PART 1/3] Starting scrape of {BASE_URL} ---")
     category_pages_to_scrape = get_all_category_pages(BASE_URL)
     logging.info(f"Found {len(category_pages_to_scrape)} category pages.")
+    run_ts = datetime.now().isoformat() # One timestamp for every row in this run
 
-    with open(RAW_JSONL, "w", encoding="utf-8") as f:
-        for url in tqdm(category_pages_to_scrape, desc="Scraping category pages"):
+    # Pages are fetched by the pool; only this thread writes to the JSONL.
+    # Images are validated as they download, so rows go straight to the clean dataset.
+    clean_lines = 0
+    with open(CLEAN_JSONL, "wb", buffering=WRITE_BUFFER_SIZE) as f, \
+         ThreadPoolExecutor(max_workers=MAX_CRAWL_WORKERS) as executor:
+        futures = [executor.submit(scrape_gallery_page, url, run_ts) for url in category_pages_to_scrape]
+        # Collected in submission order so the JSONL row order is the same on every run
+        for future, url in tqdm(zip(futures, category_pages_to_scrape), total=len(futures), desc="Scraping category pages"):
             try:
-                all_data_from_page = scrape_gallery_page(url)
+                all_data_from_page = future.result()
                 for data in all_data_from_page:
                     if data and data['images']:
-                        f.write(json.dumps(data) + "
-")
-                time.sleep(1) # Politeness delay
+                        f.write(orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE))
+                        clean_lines += 1
             except Exception as e:
                 logging.error(f"❌ Failed to scrape or save page {url}: {e}")
-    logging.info("✅ Scraper run complete.")
-
-def run_cleaner():
-    logging.info("--- [PART 2/4] Cleaning the data ---")
-    good_images = set()
-    bad_images_count = 0
-    image_files = os.listdir(RAW_IMG_DIR)
-    for filename in tqdm(image_files, desc="Validating images"):
-        source_path = os.path.join(RAW_IMG_DIR, filename)
-        clean_path = os.path.join(CLEAN_IMG_DIR, filename)
-        try:
-            with Image.open(source_path) as img:
-                img.verify()
-            shutil.copy(source_path, clean_path)
-            good_images.add(filename)
-        except Exception as e:
-            logging.warning(f"Skipping bad image {filename}: {e}")
-            bad_images_count += 1
-    logging.info(f"Found and skipped {bad_images_count} bad images.")
-
-    clean_lines = 0
-    with open(RAW_JSONL, "r", encoding="utf-8") as f_in,          open(CLEAN_JSONL, "w", encoding="utf-8") as f_out:
-        for line in f_in:
-            data = json.loads(line)
-            if not any(img['file_name'] in good_images for img in data['images']):
-                continue
-            f_out.write(json.dumps(data) + "
-")
-            clean_lines += 1
     logging.info(f"Wrote {clean_lines} clean lines to {CLEAN_JSONL}.")
-    logging.info("✅ Cleaning complete.")
+    logging.info("✅ Scraper run complete.")
 
 def create_readme():
-    logging.info("--- [PART 3/4] Creating placeholder README.md ---")
+    logging.info("--- [PART 2/3] Creating placeholder README.md ---")
     readme_content = f"""---
 license: other
 ---
@@ -235,17 +304,28 @@ This dataset is a raw scrape of the G.I. Jones Photographic Archive, hosted by S
     logging.info("✅ Placeholder README.md created.")
 
 def upload_to_hf(token):
-    logging.info("--- [PART 4/4] Uploading to Hugging Face ---")
+    logging.info("--- [PART 3/3] Uploading to Hugging Face ---")
     logging.info(f"Preparing to upload {CLEAN_DIR} to {REPO_ID}...")
     for attempt in range(3):
         try:
             api = HfApi(token=token)
             create_repo(REPO_ID, repo_type="dataset", token=token, exist_ok=True)
-            api.upload_folder(
-                folder_path=CLEAN_DIR,
-                repo_id=REPO_ID,
-                repo_type="dataset",
-            )
+            # Uploads in parallel, splits into multiple commits and resumes after failures
+            if hasattr(api, "upload_large_folder"):
+                api.upload_large_folder(
+                    folder_path=CLEAN_DIR,
+                    repo_id=REPO_ID,
+                    repo_type="dataset",
+                    ignore_patterns=["*.part"],
+                    num_workers=8,
+                )
+            else: # Not available in every huggingface_hub release
+                api.upload_folder(
+                    folder_path=CLEAN_DIR,
+                    repo_id=REPO_ID,
+                    repo_type="dataset",
+                    ignore_patterns=["*.part"],
+                )
             logging.info("="*50)
             logging.info("✅✅✅ G.I. JONES SCRAPE COMPLETE! ✅✅✅")
             logging.info(f"Your new dataset is now live at:")
@@ -5,6 +5,7 @@ import re
 import time
 import shutil
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
 from tqdm import tqdm
 from urllib.parse import urljoin
@@ -37,6 +38,8 @@ CLEAN_DOCUMENTS_ASSETS = os.path.join(CLEAN_DOCUMENTS_DIR, "documents")
 CLEAN_DOCUMENTS_JSONL = os.path.join(CLEAN_DOCUMENTS_DIR, "data.jsonl")
 CLEAN_DOCUMENTS_README = os.path.join(CLEAN_DOCUMENTS_DIR, "README.md")
 
+MAX_VALIDATION_WORKERS = 16
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
@@ -109,8 +112,7 @@ def download_file(file_url, save_dir, post_id, index):
         with open(save_path, "wb") as f:
             f.write(data)
             
-        file_size = os.path.getsize(save_path)
-        file_stats = { "file_size_bytes": file_size, "width": None, "height": None }
+        file_stats = { "file_size_bytes": len(data), "width": None, "height": None }
 
         if save_dir == RAW_DOC_DIR:
             try:
@@ -250,6 +252,17 @@ def run_scraper():
                 logging.error(f"❌ Failed to process post ID {post.get('id')}: {e}")
     logging.info("✅ Scraper run complete.")
 
+def validate_document(entry):
+    clean_path = os.path.join(CLEAN_DOCUMENTS_ASSETS, entry.name)
+    try:
+        with Image.open(entry.path) as img:
+            img.verify()
+        shutil.copy(entry.path, clean_path)
+        return entry.name, True
+    except Exception as e:
+        logging.warning(f"Skipping bad document image {entry.name}: {e}")
+        return entry.name, False
+
 def run_cleaner_and_splitter():
     logging.info(f"\n--- [PART 2/4] Cleaning and Splitting the data ---")
 
@@ -262,28 +275,24 @@ def run_cleaner_and_splitter():
     bad_documents_count = 0
     
     if os.path.exists(RAW_DOC_DIR):
-        doc_files = os.listdir(RAW_DOC_DIR)
-        for filename in tqdm(doc_files, desc="Validating Documents"):
-            source_path = os.path.join(RAW_DOC_DIR, filename)
-            clean_path = os.path.join(CLEAN_DOCUMENTS_ASSETS, filename)
-            try:
-                with Image.open(source_path) as img:
-                    img.verify()
-                shutil.copy(source_path, clean_path)
-                good_documents.add(filename)
-            except Exception as e:
-                bad_documents_count += 1
-                logging.warning(f"Skipping bad document image {filename}: {e}")
+        with os.scandir(RAW_DOC_DIR) as entries:
+            doc_files = [e for e in entries if e.is_file()]
+        # verify() and copy are I/O bound, so a thread pool scales with disk queue depth
+        with ThreadPoolExecutor(max_workers=MAX_VALIDATION_WORKERS) as executor:
+            results = list(tqdm(executor.map(validate_document, doc_files), total=len(doc_files), desc="Validating Documents"))
+        good_documents = {filename for filename, ok in results if ok}
+        bad_documents_count = len(results) - len(good_documents)
         logging.info(f"Validated and moved {len(good_documents)} documents. Skipped {bad_documents_count} bad documents.")
     else:
         logging.info("No raw document directory found. Skipping validation.")
 
     audio_files = []
     if os.path.exists(RAW_AUDIO_DIR):
-        audio_files = os.listdir(RAW_AUDIO_DIR)
+        with os.scandir(RAW_AUDIO_DIR) as entries:
+            audio_files = [e for e in entries if e.is_file()]
         logging.info("Copying audio files...")
-        for filename in tqdm(audio_files, desc="Copying Audio"):
-            shutil.copy(os.path.join(RAW_AUDIO_DIR, filename), CLEAN_AUDIO_ASSETS)
+        for entry in tqdm(audio_files, desc="Copying Audio"):
+            shutil.copy(entry.path, CLEAN_AUDIO_ASSETS)
         logging.info(f"Copied {len(audio_files)} audio files.")
     else:
         logging.info("No raw audio directory found. Skipping copy.")
@@ -1,45 +1,119 @@
 
 import os
-import json
+import orjson
 import requests
 import re
 import time
-import shutil
-from bs4 import BeautifulSoup
-from tqdm.notebook import tqdm
+import shelve
+import dbm
+import hashlib
+import uuid
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
+from tqdm.auto import tqdm
 from urllib.parse import urljoin
 from datetime import datetime
-from PIL import Image, UnidentifiedImageError
+from PIL import Image
 from huggingface_hub import HfApi, create_repo
 
 # --- Configuration ---
 BASE_URL = "https://blog.ukpuru.org"
 SOURCE_NAME = "Ukpuru Blog"
 SOURCE_ID = "ukpuru"
+LICENSE_INFO = f"© {SOURCE_NAME} (Assumed)"
 
 RAW_DIR = "data_raw"
 CLEAN_DIR = "data_clean"
 
-RAW_IMG_DIR = os.path.join(RAW_DIR, "images")
 CLEAN_IMG_DIR = os.path.join(CLEAN_DIR, "images")
-RAW_JSONL = os.path.join(RAW_DIR, "data.jsonl")
 CLEAN_JSONL = os.path.join(CLEAN_DIR, "data.jsonl")
 CLEAN_README = os.path.join(CLEAN_DIR, "README.md")
+PAGE_CACHE_DB = os.path.join(RAW_DIR, "page_cache")
+
+HEADERS = {'User-Agent': 'IgboArchives-ScraperBot/1.0'}
+
+# Concurrent post fetches and image downloads (bounds the load on the blog host)
+MAX_CRAWL_WORKERS = 8
+MAX_DOWNLOAD_WORKERS = 8
+
+# Buffer sizes for streamed downloads and JSONL output
+CHUNK_SIZE = 256 * 1024
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Download futures by URL for this run (result None = failed); later callers wait on the first fetch
+_URL_RESULT_CACHE = {}
+_URL_CACHE_LOCK = threading.Lock()
+
+# Page bodies by URL as (etag, last_modified, content), for conditional GETs on re-runs.
+# The shelf is open only while run_scraper runs; get_soup skips it otherwise.
+_PAGE_CACHE = None
+_PAGE_CACHE_LOCK = threading.Lock()
+_PAGE_CACHE_ERRORS = (*dbm.error, OSError)
+
+# Filename sanitising patterns
+_RE_STRIP = re.compile(r'[^\w\s-]')
+_RE_DASH = re.compile(r'--+')
+
+# Leading bytes of the accepted image formats (WebP is checked separately)
+_IMAGE_MAGIC = (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n", b"GIF8")
+
+# Image downloads run here, overlapping with page parsing in the crawl workers
+DOWNLOAD_POOL = ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS)
+
+# Shared session: keeps connections to the blog host alive between requests
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504])
+))
 
 # --- Helper Functions ---
-def get_soup(url):
+def _cache_get(url):
+    with _PAGE_CACHE_LOCK:
+        if _PAGE_CACHE is None: return None
+        try:
+            return _PAGE_CACHE.get(url)
+        except _PAGE_CACHE_ERRORS:
+            return None
+
+def _cache_put(url, entry):
+    with _PAGE_CACHE_LOCK:
+        if _PAGE_CACHE is None: return
+        try:
+            _PAGE_CACHE[url] = entry
+        except _PAGE_CACHE_ERRORS as e:
+            print(f"⚠️ Could not cache {url}: {e}")
+
+def get_soup(url, parse_only=None):
     try:
-        headers = {'User-Agent': 'IgboArchives-ScraperBot/1.0'}
-        r = requests.get(url, params={'m': '0'}, timeout=20, headers=headers)
-        r.raise_for_status()
-        return BeautifulSoup(r.text, "html.parser")
+        cached = _cache_get(url)
+        headers = {}
+        if cached:
+            etag, last_modified, _ = cached
+            if etag: headers['If-None-Match'] = etag
+            if last_modified: headers['If-Modified-Since'] = last_modified
+        r = SESSION.get(url, params={'m': '0'}, timeout=20, headers=headers)
+        if r.status_code == 304 and cached:
+            content = cached[2] # Unchanged since the last run
+        else:
+            r.raise_for_status()
+            content = r.content
+            etag, last_modified = r.headers.get('ETag'), r.headers.get('Last-Modified')
+            if etag or last_modified:
+                _cache_put(url, (etag, last_modified, content))
+        return BeautifulSoup(content, "lxml", parse_only=parse_only)
     except requests.exceptions.RequestException:
         return None
 
 def sanitize_filename(name):
     name = name.lower().replace(" ", "-")
-    name = re.sub(r'[^\w\s-]', '', name)
-    name = re.sub(r'--+', '-', name)
+    name = _RE_STRIP.sub('', name)
+    name = _RE_DASH.sub('-', name)
     return name[:100]
 
 def get_all_posts(base_url):
@@ -47,7 +121,8 @@ def get_all_posts(base_url):
     current_url = base_url
     pbar = tqdm(desc="Finding all post pages")
     while current_url:
-        soup = get_soup(current_url)
+        # Only post titles and the pager link are needed from listing pages
+        soup = get_soup(current_url, parse_only=SoupStrainer(["h3", "a"]))
         if soup is None: break
         links = [a["href"] for a in soup.select("h3.post-title a")]
         if not links: break
@@ -62,20 +137,68 @@ def get_all_posts(base_url):
     pbar.close()
     return list(dict.fromkeys(posts))
 
+def _is_image_header(head):
+    if head.startswith(b"RIFF"): return head[8:12] == b"WEBP"
+    return head.startswith(_IMAGE_MAGIC)
+
+def _stream_image(img_url, part_path):
+    # Returns bytes written; rejects non-images by their leading bytes and short reads by Content-Length
+    file_size = 0
+    head = b""
+    with SESSION.get(img_url, stream=True, timeout=15) as r:
+        r.raise_for_status()
+        with open(part_path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                if len(head) < 12:
+                    # Chunks can be tiny, so collect the first 12 bytes before sniffing them
+                    head += chunk[:12 - len(head)]
+                    if len(head) == 12 and not _is_image_header(head):
+                        raise ValueError("response is not a JPEG/PNG/GIF/WebP image")
+                f.write(chunk)
+                file_size += len(chunk)
+        if not file_size:
+            raise ValueError("empty response")
+        if len(head) < 12:
+            raise ValueError("response is not a JPEG/PNG/GIF/WebP image")
+        expected_size = r.headers.get("Content-Length")
+        if expected_size and "Content-Encoding" not in r.headers and int(expected_size) != file_size:
+            raise ValueError(f"truncated download ({file_size} of {expected_size} bytes)")
+    return file_size
+
 def download_image(img_url, post_slug, index):
+    with _URL_CACHE_LOCK:
+        future = _URL_RESULT_CACHE.get(img_url)
+        is_owner = future is None
+        if is_owner:
+            future = _URL_RESULT_CACHE[img_url] = Future()
+    if is_owner:
+        future.set_result(_fetch_image(img_url, post_slug, index))
+    return future.result()
+
+def _fetch_image(img_url, post_slug, index):
     try:
-        img_url = urljoin(BASE_URL, img_url)
-        data = requests.get(img_url, timeout=15, headers={'User-Agent': 'IgboArchives-ScraperBot/1.0'}).content
         ext = os.path.splitext(img_url.split("?")[0])[-1].lower()
         if not ext or ext not in ['.jpg', '.jpeg', '.png', '.gif', '.webp']: ext = ".jpg"
-        new_filename = f"{SOURCE_ID}_{post_slug}_{index:02d}{ext}"
-        save_path = os.path.join(RAW_IMG_DIR, new_filename)
-        with open(save_path, "wb") as f: f.write(data)
+        # The URL hash keeps names unique when post titles collide (e.g. "Untitled")
+        url_hash = hashlib.sha1(img_url.encode("utf-8")).hexdigest()[:10]
+        new_filename = f"{SOURCE_ID}_{post_slug}_{index:02d}_{url_hash}{ext}"
+        save_path = os.path.join(CLEAN_IMG_DIR, new_filename)
+        if os.path.exists(save_path): return new_filename # Validated on a previous run
+        # Unique per attempt, and created by open() so the final file gets the usual umask mode
+        part_path = f"{save_path}.{uuid.uuid4().hex}.part"
+        # Validated while streaming, so only good images reach CLEAN_IMG_DIR
+        try:
+            _stream_image(img_url, part_path)
+            with Image.open(part_path): pass # Header read only; rejects files PIL cannot identify
+        except Exception:
+            if os.path.exists(part_path): os.remove(part_path)
+            raise
+        os.replace(part_path, save_path)
         return new_filename
     except Exception:
         return None
 
-def scrape_post_data(url):
+def scrape_post_data(url, run_ts):
     soup = get_soup(url)
     if soup is None: return None
     title_tag = soup.select_one("h1.post-title") or soup.select_one("h3.post-title")
@@ -83,9 +206,9 @@ def scrape_post_data(url):
     post_slug = sanitize_filename(title)
     content_div = soup.select_one("div.post-body")
     if not content_div: return None
-    raw_text_content = content_div.get_text("
-", strip=True)
-    scraped_images = []
+    raw_text_content = content_div.get_text("\n", strip=True)
+    # Queue every download first so they run while the rest of the post is parsed
+    pending = []
     for i, img_tag in enumerate(content_div.select("img")):
         img_src = img_tag.get('src')
         if not img_src: continue
@@ -96,72 +219,70 @@ def scrape_post_data(url):
             caption = caption_tag.get_text(strip=True) if caption_tag else None
         elif img_tag.find_next_sibling("p", class_="wp-caption-text"):
             caption = img_tag.find_next_sibling("p", class_="wp-caption-text").get_text(strip=True)
-        new_filename = download_image(img_src, post_slug, i)
+        full_url = urljoin(BASE_URL, img_src)
+        pending.append((full_url, caption, DOWNLOAD_POOL.submit(download_image, full_url, post_slug, i)))
+    tags = [a.get_text(strip=True) for a in soup.select("a[rel='tag']")]
+    scraped_images = []
+    for full_url, caption, future in pending:
+        new_filename = future.result()
         if new_filename:
             scraped_images.append({
                 "file_name": new_filename,
-                "original_url": urljoin(BASE_URL, img_src),
+                "original_url": full_url,
                 "raw_caption": caption
             })
-    tags = [a.get_text(strip=True) for a in soup.select("a[rel='tag']")]
     post_data = {
         "id": f"{SOURCE_ID}_{sanitize_filename(url)}",
         "source_name": SOURCE_NAME, "source_type": "secondary",
         "original_url": url, "title": title, "raw_content": raw_text_content,
         "images": scraped_images, "tags_scraped": tags,
-        "license_info": f"© {SOURCE_NAME} (Assumed)",
-        "timestamp_scraped": datetime.now().isoformat(),
+        "license_info": LICENSE_INFO,
+        "timestamp_scraped": run_ts,
         "source_specific_metadata": {}
     }
     return post_data
 
 def run_scraper():
-    print(f"--- [PART 1/3] Starting scrape of {BASE_URL} ---")
-    os.makedirs(RAW_IMG_DIR, exist_ok=True)
+    global _PAGE_CACHE
+    print(f"--- [PART 1/2] Starting scrape of {BASE_URL} ---")
+    os.makedirs(RAW_DIR, exist_ok=True)
+    os.makedirs(CLEAN_IMG_DIR, exist_ok=True)
+    try:
+        _PAGE_CACHE = shelve.open(PAGE_CACHE_DB)
+    except _PAGE_CACHE_ERRORS as e:
+        print(f"⚠️ Page cache unavailable, fetching every page: {e}")
+    try:
+        _crawl()
+    finally:
+        with _PAGE_CACHE_LOCK:
+            if _PAGE_CACHE is not None:
+                _PAGE_CACHE.close()
+                _PAGE_CACHE = None
+
+def _crawl():
     posts_to_scrape = get_all_posts(BASE_URL)
     print(f"Found {len(posts_to_scrape)} total posts.")
-    with open(RAW_JSONL, "w", encoding="utf-8") as f:
-        for url in tqdm(posts_to_scrape, desc="Scraping new posts"):
+    run_ts = datetime.now().isoformat() # One timestamp for every row in this run
+    # Posts are fetched by the pool; only this thread writes to the JSONL.
+    # Images are validated as they download, so rows go straight to the clean dataset.
+    clean_lines = 0
+    with open(CLEAN_JSONL, "wb", buffering=WRITE_BUFFER_SIZE) as f, \
+         ThreadPoolExecutor(max_workers=MAX_CRAWL_WORKERS) as executor:
+        futures = [executor.submit(scrape_post_data, url, run_ts) for url in posts_to_scrape]
+        # Collected in submission order so the JSONL row order is the same on every run
+        for future, url in tqdm(zip(futures, posts_to_scrape), total=len(futures), desc="Scraping new posts"):
             try:
-                data = scrape_post_data(url)
-                if data: f.write(json.dumps(data) + "
-")
+                data = future.result()
+                if data:
+                    f.write(orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE))
+                    clean_lines += 1
             except Exception as e:
                 print(f"❌ Failed to scrape or save {url}: {e}")
-    print("✅ Scraper run complete.")
-
-def run_cleaner():
-    print(f"
---- [PART 2/3] Cleaning the data ---")
-    os.makedirs(CLEAN_IMG_DIR, exist_ok=True)
-    good_images = set()
-    bad_images_count = 0
-    image_files = os.listdir(RAW_IMG_DIR)
-    for filename in tqdm(image_files, desc="Validating images"):
-        source_path = os.path.join(RAW_IMG_DIR, filename)
-        clean_path = os.path.join(CLEAN_IMG_DIR, filename)
-        try:
-            with Image.open(source_path) as img: img.verify()
-            shutil.copy(source_path, clean_path)
-            good_images.add(filename)
-        except Exception:
-            bad_images_count += 1
-    print(f"Found and skipped {bad_images_count} bad images.")
-    
-    clean_lines = 0
-    with open(RAW_JSONL, "r", encoding="utf-8") as f_in,          open(CLEAN_JSONL, "w", encoding="utf-8") as f_out:
-        for line in f_in:
-            data = json.loads(line)
-            data['images'] = [img for img in data['images'] if img['file_name'] in good_images]
-            f_out.write(json.dumps(data) + "
-")
-            clean_lines += 1
     print(f"Wrote {clean_lines} clean lines to {CLEAN_JSONL}.")
-    print("✅ Cleaning complete.")
+    print("✅ Scraper run complete.")
 
 def create_readme():
-    print(f"
---- [PART 3/3] Creating README.md ---")
+    print(f"\n--- [PART 2/2] Creating README.md ---")
     # (Here you would add the full README content)
     readme_content = "This folder contains the clean data."
     with open(os.path.join(CLEAN_DIR, "README.md"), "w", encoding="utf-8") as f:
@@ -170,8 +291,6 @@ def create_readme():
 
 if __name__ == "__main__":
     run_scraper()
-    run_cleaner()
     create_readme()
-    print("
---- Process Finished ---")
+    print("\n--- Process Finished ---")
     print(f"Clean data is ready in {CLEAN_DIR}")